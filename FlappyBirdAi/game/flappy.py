@@ -1,10 +1,17 @@
 # Flappy Bird Game - Main Game Loop
+import multiprocessing
 import os
+import sys
 from pygame.locals import *
 import pygame
 import random
+import numpy as np
 import neat
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 # import utils.visualize as visualize
+from utils.batch_network import BatchFeedForwardNetwork
+from utils.parallel import ChunkedParallelEvaluator
+from flappy_physics import broadphase, step_all
 
 # Game constants
 # Screen dimensions
@@ -20,6 +27,9 @@ GAME_SPEED = 30  # Speed of pipes and ground moving
 GROUND_WIDHT = 2 * SCREEN_WIDHT
 GROUND_HEIGHT = 100
 
+# Horizontal position of every bird; birds only ever move vertically
+BIRD_X = SCREEN_WIDHT // 6
+
 # Pipe dimensions
 PIPE_WIDHT = 70
 PIPE_HEIGHT = 500
@@ -27,67 +37,89 @@ PIPE_HEIGHT = 500
 # Gap between upper and lower pipes
 PIPE_GAP = 200
 
+# Normalization of the network inputs (bird height, distance to the pipe, distance to the gap
+# center, vertical speed); it is folded into the networks' input weights once per generation
+INPUT_SCALES = (1.0 / SCREEN_HEIGHT, 1.0 / SCREEN_WIDHT, 1.0 / SCREEN_HEIGHT, 1.0 / 20)
+
 # fps
 fps = 30
 
+# Frame cap per generation so birds that never crash cannot fly forever (about 750 pipes,
+# far past the config's fitness_threshold, which neat only checks once a generation ends)
+MAX_FRAMES = 10000
+
+# Training speed-ups: HEADLESS never shows a window, and RENDER_EVERY draws only one frame
+# in that many. The physics and networks still run every frame, so fitness is unaffected
+HEADLESS = os.environ.get('HEADLESS', '0') == '1'
+RENDER_EVERY = int(os.environ.get('RENDER_EVERY', '1'))
+if RENDER_EVERY < 1:
+    raise ValueError(f"RENDER_EVERY must be at least 1, got {RENDER_EVERY}")
+if HEADLESS:
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
 # Audio file paths
 wing = 'FlappyBirdAi/game/assets/audio/wing.wav'  # Sound when bird flaps
 hit = 'FlappyBirdAi/game/assets/audio/hit.wav'    # Sound when bird hits obstacle
 
-# Initialize pygame mixer for sound effects
-pygame.mixer.init()
+# The sound effects are never played during training, so the mixer (and its audio
+# device and thread) is only started when FLAPPY_AUDIO=1 asks for it
+AUDIO = os.environ.get('FLAPPY_AUDIO', '0') == '1'
+if AUDIO:
+    pygame.mixer.init()
+
+# Sprite cache: every image is loaded, scaled and flipped once and shared by all sprites using it
+BIRD_COLORS = ['bluebird', 'redbird', 'yellowbird']
+_SPRITES = {}
+# Rendered score labels by value; every generation counts up through the same scores
+_SCORE_TEXT = {}
+# Networks of the previous generation by genome key, reused for the genomes that survive it
+_NET_CACHE = {}
+
+
+def load_sprites():
+    """Fill the sprite cache; needs a display mode to be set for convert_alpha"""
+    if _SPRITES:
+        return
+
+    def load(name):
+        return pygame.image.load(f'FlappyBirdAi/game/assets/sprites/{name}.png').convert_alpha()
+
+    for bird_color in BIRD_COLORS:
+        for flap in ('upflap', 'midflap', 'downflap'):
+            _SPRITES[f'{bird_color}-{flap}'] = load(f'{bird_color}-{flap}')
+
+    pipe = pygame.transform.scale(load('pipe-green'), (PIPE_WIDHT, PIPE_HEIGHT))
+    _SPRITES['pipe-green-up'] = pipe
+    _SPRITES['pipe-green-down'] = pygame.transform.flip(pipe, False, True)
+    # The ground is one strip holding the base image twice, so it scrolls by blitting at an offset
+    base = pygame.transform.scale(load('base'), (GROUND_WIDHT, GROUND_HEIGHT))
+    _SPRITES['ground'] = pygame.Surface((2 * GROUND_WIDHT, GROUND_HEIGHT)).convert()
+    _SPRITES['ground'].blits([(base, (0, 0)), (base, (GROUND_WIDHT, 0))], doreturn=False)
+
+    # The background is opaque, so convert() gives it the display's pixel format
+    # and its full-screen blit becomes a plain copy
+    _SPRITES['background'] = pygame.transform.scale(
+        pygame.image.load('FlappyBirdAi/game/assets/sprites/background-day.png'), (SCREEN_WIDHT, SCREEN_HEIGHT)).convert()
 
 # Sprites: Bird
 
 
 class Bird(pygame.sprite.Sprite):
-    """Represents the flappy bird character"""
+    """Draws a flappy bird character; its position and speed live in run_bird's state arrays"""
 
     def __init__(self):
         pygame.sprite.Sprite.__init__(self)
 
-        # Load bird animation frames (3 different wing positions)
-        bird_color = random.choice(['bluebird', 'redbird', 'yellowbird'])
-        self.images = [pygame.image.load(f'FlappyBirdAi/game/assets/sprites/{bird_color}-upflap.png').convert_alpha(),
-                       pygame.image.load(
-                           f'FlappyBirdAi/game/assets/sprites/{bird_color}-midflap.png').convert_alpha(),
-                       pygame.image.load(f'FlappyBirdAi/game/assets/sprites/{bird_color}-downflap.png').convert_alpha()]
-
-        # Initial vertical velocity
-        self.speed = SPEED
+        # Bird animation frames (3 different wing positions) from the sprite cache
+        bird_color = random.choice(BIRD_COLORS)
+        self.images = [_SPRITES[f'{bird_color}-upflap'],
+                       _SPRITES[f'{bird_color}-midflap'],
+                       _SPRITES[f'{bird_color}-downflap']]
 
-        # Animation frame counter
-        self.current_image = 0
-        self.image = pygame.image.load(
-            'FlappyBirdAi/game/assets/sprites/bluebird-upflap.png').convert_alpha()
-        # Create collision mask from image
-        self.mask = pygame.mask.from_surface(self.image)
-
-        # Set initial bird position (left side, middle height)
-        self.rect = self.image.get_rect()
-        self.rect[0] = SCREEN_WIDHT / 6
+        # Set initial bird position (left side, middle height); run_bird picks the frame to draw
+        self.rect = self.images[0].get_rect()
+        self.rect[0] = BIRD_X
         self.rect[1] = SCREEN_HEIGHT / 2
-        self.score = 0
-
-    def update(self):
-        """Update bird animation and apply gravity"""
-        # Cycle through animation frames
-        self.current_image = (self.current_image + 1) % 3
-        self.image = self.images[self.current_image]
-        # Apply gravity (increases falling speed)
-        self.speed += GRAVITY
-
-        # Update bird's vertical position
-        self.rect[1] += self.speed
-
-    def bump(self):
-        """Make the bird flap (jump upward)"""
-        self.speed = -SPEED
-
-    def begin(self):
-        """Animate bird during menu screen"""
-        self.current_image = (self.current_image + 1) % 3
-        self.image = self.images[self.current_image]
 
 
 class Pipe(pygame.sprite.Sprite):
@@ -96,69 +128,36 @@ class Pipe(pygame.sprite.Sprite):
     def __init__(self, inverted, xpos, ysize):
         pygame.sprite.Sprite.__init__(self)
 
-        # Load pipe sprite
-        self.image = pygame.image.load(
-            'FlappyBirdAi/game/assets/sprites/pipe-green.png').convert_alpha()
-        self.image = pygame.transform.scale(
-            self.image, (PIPE_WIDHT, PIPE_HEIGHT))
+        # Pipe sprite (pre-scaled, and pre-flipped upside down for the top pipe)
+        self.image = _SPRITES['pipe-green-down' if inverted else 'pipe-green-up']
 
         # Set pipe position
         self.rect = self.image.get_rect()
-        self.rect[0] = xpos
         self.inverted = inverted
+        self.place(xpos, ysize)
+
+    def place(self, xpos, ysize):
+        """Move the pipe to xpos with ysize pixels of it on screen; used to reuse retired pipes"""
+        self.rect[0] = xpos
         # Position pipe (inverted is top pipe, normal is bottom pipe)
-        if inverted:
-            # Flip image upside down for top pipe
-            self.image = pygame.transform.flip(self.image, False, True)
+        if self.inverted:
             self.rect[1] = -(self.rect[3] - ysize)
         else:
             # Position bottom pipe
             self.rect[1] = SCREEN_HEIGHT - ysize
 
-        # Create collision mask
-        self.mask = pygame.mask.from_surface(self.image)
-
-        # Track which birds have passed this pipe
-        self.passed_birds = set()
-
-    def update(self):
-        """Move pipe to the left"""
-        self.rect[0] -= GAME_SPEED
-
-
-# Sprites: Ground
-class Ground(pygame.sprite.Sprite):
-    """Represents the ground at the bottom of the screen"""
-
-    def __init__(self, xpos):
-        pygame.sprite.Sprite.__init__(self)
-        # Load ground sprite
-        self.image = pygame.image.load(
-            'FlappyBirdAi/game/assets/sprites/base.png').convert_alpha()
-        self.image = pygame.transform.scale(
-            self.image, (GROUND_WIDHT, GROUND_HEIGHT))
-
-        # Create collision mask
-        self.mask = pygame.mask.from_surface(self.image)
-
-        # Position ground at the bottom of the screen
-        self.rect = self.image.get_rect()
-        self.rect[0] = xpos
-        self.rect[1] = SCREEN_HEIGHT - GROUND_HEIGHT
 
-    def update(self):
-        """Move ground to the left"""
-        self.rect[0] -= GAME_SPEED
+def get_random_pipes(xpos, rng=random, pool=None) -> tuple[Pipe, Pipe]:
+    """Generate a random pipe pair (top and bottom pipes with random gap) drawn from rng
 
-
-def is_off_screen(sprite):
-    """Check if a sprite has moved off the left side of the screen"""
-    return sprite.rect[0] < -(sprite.rect[2])
-
-
-def get_random_pipes(xpos) -> tuple[Pipe, Pipe]:
-    """Generate a random pipe pair (top and bottom pipes with random gap)"""
-    size = random.randint(150, 400)
+    If pool holds retired pipe pairs, one of them is moved into place instead of creating new sprites.
+    """
+    size = rng.randint(150, 400)
+    if pool:
+        pipe, pipe_inverted = pool.pop()
+        pipe.place(xpos, size)
+        pipe_inverted.place(xpos, SCREEN_HEIGHT - size - PIPE_GAP)
+        return pipe, pipe_inverted
     # Create bottom pipe
     pipe = Pipe(False, xpos, size)
     # Create top pipe with consistent gap
@@ -166,149 +165,200 @@ def get_random_pipes(xpos) -> tuple[Pipe, Pipe]:
     return pipe, pipe_inverted
 
 
-def run_bird(genomes, config):
-    nets = []
+def collide_birds(active, bird_y, bird_width, bird_height, obstacles):
+    """Return the lanes in active whose bird touches any of the obstacle sprites
+
+    Pipes are solid rectangles, so birds collide by rect alone: one compiled
+    test over every bird and obstacle, with no mask scans.
+    """
+    rects = np.array([obstacle.rect for obstacle in obstacles], dtype=np.float64)
+    overlap = broadphase(bird_y, active, rects, BIRD_X, bird_width, bird_height)
+    return active[overlap.any(axis=1)]
+
+
+def run_bird(genomes, config, seed=None):
+    # The pipe course has its own generator, so a seed fixes it no matter how many birds fly
+    course = random.Random(random.getrandbits(32) if seed is None else seed)
     ge = []
     birds = []
 
-    # Game initialization
-    pygame.init()
+    # Game initialization; only the modules the game uses, since pygame.init() would also open the mixer
+    pygame.display.init()
+    pygame.font.init()
     screen = pygame.display.set_mode((SCREEN_WIDHT, SCREEN_HEIGHT))
     pygame.display.set_caption('Flappy AI')
     pygame.display.set_icon(pygame.image.load(
         'FlappyBirdAi/game/assets/sprites/redbird-upflap.png'))
+    load_sprites()
+    # Only quit events are handled, so keep everything else out of the queue
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed([QUIT])
 
-    # Load game images
-    BACKGROUND = pygame.image.load('FlappyBirdAi/game/assets/sprites/background-day.png')
-    BACKGROUND = pygame.transform.scale(
-        BACKGROUND, (SCREEN_WIDHT, SCREEN_HEIGHT))
-
-    # Create sprite groups for collision detection and rendering
-    bird_group = pygame.sprite.Group()
-    # bird = Bird()
-    # bird_group.add(bird)
+    BACKGROUND = _SPRITES['background']
 
-    # Create ground sprites (two for continuous scrolling)
-    ground_group = pygame.sprite.Group()
+    GROUND = _SPRITES['ground']
+    ground_offset = 0  # How far the ground strip has scrolled left
 
+    # Create initial pipe pairs; pipes are a plain list kept in x order, so the leftmost pair is always first
+    pipes = []
+    pipe_pool = []  # Pipe pairs that scrolled off screen, ready for reuse
     for i in range(2):
-        ground = Ground(GROUND_WIDHT * i)
-        ground_group.add(ground)
-
-    # Create initial pipe pairs
-    pipe_group = pygame.sprite.Group()
-    for i in range(2):
-        pipes = get_random_pipes(SCREEN_WIDHT * i + 800)
-        pipe_group.add(pipes[0])
-        pipe_group.add(pipes[1])
+        pipes.extend(get_random_pipes(SCREEN_WIDHT * i + 800, course))
+    # Pipe pair state as arrays, one entry per pair in x order: the pairs' x position, the
+    # top of the bottom pipe (the bottom of the gap), and whether the birds have passed it.
+    # The sprites only mirror pipe_x for drawing and collision
+    pipe_x = np.array([pipe.rect[0] for pipe in pipes[::2]])
+    pipe_top = np.array([pipe.rect.top for pipe in pipes[::2]])
+    pipe_passed = np.zeros(len(pipe_x), dtype=bool)
     for _, g in genomes:
-        net = neat.nn.FeedForwardNetwork.create(g, config)
-        nets.append(net)
-        g.fitness = 0
         # init bird
         bird = Bird()
         birds.append(bird)
-        bird_group.add(bird)
         ge.append(g)
+    # Every genome's network, evaluated for the whole population at once
+    nets = BatchFeedForwardNetwork.create(ge, config, _NET_CACHE)
+    nets.scale_inputs(INPUT_SCALES)
+    # Birds flap when their tanh output is positive, which is when its pre-activation value is
+    nets.linearize_outputs()
+
+    # Bird state as arrays with one lane per genome; lanes keep their index for the
+    # whole generation, and the sprites only supply the animation frames to draw at bird_y
+    n = len(ge)
+    bird_y = np.full(n, float(birds[0].rect[1]))
+    bird_speed = np.full(n, float(SPEED))  # Initial vertical velocity
+    bird_score = np.zeros(n, dtype=np.int32)
+    fitness = np.zeros(n)  # Written back to the genomes at the end
+    alive = np.ones(n, dtype=bool)
+    active = np.arange(n)  # Indices of the birds still flying
+    input_buffer = np.empty((n, 4))  # Network inputs, one row per entry of active
+    bird_width, bird_height = birds[0].rect.size
+    bird_half_height = bird_height // 2
 
     global generation
 
     score = 0  # Player score (increments when passing pipes)
     font = pygame.font.Font(None, 74)  # Font for score display
+    small_font = pygame.font.Font(None, 30)  # Font for generation info
+    # Text surfaces are only rendered on drawn frames, and only when the number they show changes
+    score_text = birds_text = None
+    shown_score = shown_birds = None
     # Game state variables
     clock = pygame.time.Clock()
 
+    frame = 0
+    flap = 0  # Animation frame of every bird, advanced on drawn frames
+    # Screen areas drawn on the previous drawn frame; the first frame uploads the whole window.
+    # Every bird is drawn in the same column, which is uploaded as a single strip
+    last_drawn = [screen.get_rect()]
+    bird_column = pygame.Rect(BIRD_X, 0, bird_width, SCREEN_HEIGHT)
+
     # Main loop
-    while birds:
-        clock.tick(fps)
-
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                pygame.quit()
-
-        for i in range(len(ge)):
-            ge[i].fitness += 0.001
-
-        # Check if birds have passed pipes and reward them
-        for pipe in pipe_group:
-            if not pipe.inverted:  # Only check bottom pipes to avoid double-counting
-                for i, bird in enumerate(birds):
-                    # Bird has passed the pipe if bird's left edge is past pipe's right edge
-                    if bird.rect.left > pipe.rect.right and bird not in pipe.passed_birds:  # Use bird object
-                        # Store bird object, not index
-                        pipe.passed_birds.add(bird)
-                        ge[i].fitness += 5
-                        bird.score += 1
-                        if bird.score == 20:
-                            ge[i].fitness += 10
-
-        # Network input/output
-        for index, bird in enumerate(birds):
-            next_pipe = None
-            for pipe in pipe_group:
-                if not pipe.inverted and pipe.rect.right > bird.rect.left:
-                    next_pipe = pipe
-                    break
-
-            inputs = [
-                bird.rect[1] / SCREEN_HEIGHT,  # 0-1 range
-                (next_pipe.rect[0] - bird.rect[0]) / SCREEN_WIDHT,
-                (next_pipe.rect.top - PIPE_GAP / 2 -
-                 bird.rect.centery) / SCREEN_HEIGHT,
-                bird.speed / 20,
-            ]
-
-            output = nets[index].activate(inputs)
-            if output[0] > 0.0:
-                bird.bump()
-
-        # update sprites
-        bird_group.update()
-        pipe_group.update()
-        ground_group.update()
-        screen.blit(BACKGROUND, (0, 0))
-        if is_off_screen(pipe_group.sprites()[0]):
-            pipe_group.remove(pipe_group.sprites()[0])
-            pipe_group.remove(pipe_group.sprites()[0])
-
-            pipes = get_random_pipes(SCREEN_WIDHT * 2)
-
-            pipe_group.add(pipes[0])
-            pipe_group.add(pipes[1])
+    while active.size and frame < MAX_FRAMES:
+        # Only frames that are drawn are paced; the others run as fast as possible
+        render = not HEADLESS and frame % RENDER_EVERY == 0
+        frame += 1
+        if render:
+            clock.tick(fps)
+
+        # The queue only ever holds QUIT; poll it on drawn frames, and every 100 frames otherwise
+        if (render or frame % 100 == 0) and pygame.event.peek(QUIT):
+            pygame.quit()
+
+        fitness[active] += 0.001
+
+        # Check if birds have passed pipes and reward them; every bird is at BIRD_X, so they
+        # pass a pipe together when their left edge gets past the pipe's right edge
+        pipe_right = pipe_x + PIPE_WIDHT
+        newly_passed = (BIRD_X > pipe_right) & ~pipe_passed
+        for _ in range(np.count_nonzero(newly_passed)):
+            fitness[active] += 5
+            bird_score[active] += 1
+            fitness[active[bird_score[active] == 20]] += 10
+        pipe_passed |= newly_passed
+
+        # The pipe ahead of the birds
+        next_pipe = np.flatnonzero(pipe_right > BIRD_X)[0]
+
+        # Network input/output: one input row per bird, all networks queried in one batched pass.
+        # The inputs are left unnormalized; the networks apply INPUT_SCALES themselves
+        inputs = input_buffer[:active.size]
+        np.take(bird_y, active, out=inputs[:, 0])
+        inputs[:, 1] = pipe_x[next_pipe] - BIRD_X
+        np.subtract(pipe_top[next_pipe] - PIPE_GAP / 2 - bird_half_height, inputs[:, 0], out=inputs[:, 2])
+        np.take(bird_speed, active, out=inputs[:, 3])
+
+        # Flapping birds jump upward, then gravity is applied and every bird moves in one compiled step
+        outputs = nets.activate(inputs, active)
+        step_all(bird_y, bird_speed, outputs, active, GRAVITY, SPEED)
+
+        # update sprites; the birds are drawn straight from bird_y and flap in lockstep,
+        # so their animation is a single frame index shared by all of them
+        if render:
+            flap = (flap + 1) % 3
+        # Move the pipes to the left
+        pipe_x -= GAME_SPEED
+        for pipe, x in zip(pipes, np.repeat(pipe_x, 2).tolist()):
+            pipe.rect[0] = x
+        ground_offset = (ground_offset + GAME_SPEED) % GROUND_WIDHT
+        if render:
+            screen.blit(BACKGROUND, (0, 0))
+        if pipe_x[0] < -PIPE_WIDHT:
+            pipe_pool.append(tuple(pipes[:2]))
+            del pipes[:2]
+
+            new_pipes = get_random_pipes(SCREEN_WIDHT * 2, course, pipe_pool)
+            pipes.extend(new_pipes)
+            pipe_x = np.append(pipe_x[1:], new_pipes[0].rect[0])
+            pipe_top = np.append(pipe_top[1:], new_pipes[0].rect.top)
+            pipe_passed = np.append(pipe_passed[1:], False)
 
             score += 1
-        if is_off_screen(ground_group.sprites()[0]):
-            ground_group.remove(ground_group.sprites()[0])
-
-            new_ground = Ground(GROUND_WIDHT - 20)
-            ground_group.add(new_ground)
-
-        bird_group.draw(screen)
-        pipe_group.draw(screen)
-        ground_group.draw(screen)
-        for i in reversed(range(len(birds))):
-            bird = birds[i]
-            hit_ground = pygame.sprite.spritecollideany(
-                bird, ground_group, pygame.sprite.collide_mask)
-            hit_pipe = pygame.sprite.spritecollideany(
-                bird, pipe_group, pygame.sprite.collide_mask)
-            out_of_bounds = (bird.rect[1] > SCREEN_HEIGHT or bird.rect[1] < 0)
-
-            if (hit_ground or hit_pipe or out_of_bounds):
-                ge[i].fitness -= 4
-                bird_group.remove(bird)
-                birds.pop(i)
-                nets.pop(i)
-                ge.pop(i)
-
-        score_text = font.render(str(score), True, (255, 255, 255))
-        screen.blit(score_text, (SCREEN_WIDHT / 2 - 20, 50))
+
+        if render:
+            # Submit the sprites in batched blits calls instead of one blit per sprite
+            screen.blits([(birds[i].images[flap], (BIRD_X, y)) for i, y in zip(active.tolist(), bird_y[active].tolist())],
+                         doreturn=False)
+            drawn = screen.blits([(pipe.image, pipe.rect) for pipe in pipes]
+                                 + [(GROUND, (-ground_offset, SCREEN_HEIGHT - GROUND_HEIGHT))])
+            drawn.append(bird_column)
+        # Birds die when they hit the ground or a pipe, or leave the screen
+        dead = np.zeros(len(birds), dtype=bool)
+        dead[collide_birds(active, bird_y, bird_width, bird_height, pipes)] = True
+        # The ground spans the whole screen width, so touching it is a height check
+        dead[active] |= (bird_y[active] + bird_height > SCREEN_HEIGHT - GROUND_HEIGHT) | (bird_y[active] < 0)
+        dead = np.flatnonzero(dead)
+        if dead.size:
+            fitness[dead] -= 4
+            alive[dead] = False
+            active = np.flatnonzero(alive)
+
+        if not render:
+            continue
+        if score != shown_score:
+            shown_score = score
+            score_text = _SCORE_TEXT.get(score)
+            if score_text is None:
+                score_text = _SCORE_TEXT[score] = font.render(str(score), True, (255, 255, 255))
+        drawn.append(screen.blit(score_text, (SCREEN_WIDHT / 2 - 20, 50)))
         # Show generation info (optional)
-        small_font = pygame.font.Font(None, 30)
-        birds_text = small_font.render(
-            f'Birds: {len(birds)}', True, (255, 255, 255))
-        screen.blit(birds_text, (10, 10))
-        pygame.display.update()
+        if active.size != shown_birds:
+            shown_birds = active.size
+            birds_text = small_font.render(
+                f'Birds: {shown_birds}', True, (255, 255, 255))
+        drawn.append(screen.blit(birds_text, (10, 10)))
+        # Only upload what was drawn now or on the previous drawn frame, which covers
+        # everything that moved; the rest of the window is unchanged background
+        pygame.display.update(drawn + last_drawn)
+        last_drawn = drawn
+
+    for g, f in zip(ge, fitness.tolist()):
+        g.fitness = f
+
+
+def eval_chunk(chunk, config, seed):
+    """Plays a slice of the population in a HEADLESS worker process (see ChunkedParallelEvaluator)"""
+    run_bird(chunk, config, seed)
+    return [g.fitness for _, g in chunk]
 
 
 if __name__ == "__main__":
@@ -325,8 +375,16 @@ if __name__ == "__main__":
     stats = neat.StatisticsReporter()
     p.add_reporter(stats)
 
-    # Run NEAT
-    winner = p.run(run_bird, 200)
+    # Run NEAT; headless runs spread each generation across the CPU cores, with
+    # every worker flying the same pipe course
+    if HEADLESS:
+        evaluator = ChunkedParallelEvaluator(multiprocessing.cpu_count(), eval_chunk, shared_seed=True)
+        try:
+            winner = p.run(evaluator.evaluate, 200)
+        finally:
+            evaluator.close()
+    else:
+        winner = p.run(run_bird, 200)
     print("Best fitness:", winner.fitness)
     # Visualize the best network
     node_names = {
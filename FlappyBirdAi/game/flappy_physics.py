@@ -0,0 +1,54 @@
+# Flappy Bird physics - compiled kernels for the bird population
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True, fastmath=True)
+def step_all(y, speed, outputs, active, gravity, flap_speed):
+    """
+    Advances every flying bird by one frame.
+
+    Birds whose network output is positive flap first, then gravity is
+    applied and the birds move. The state arrays are updated in place.
+
+    Args:
+        y, speed: Length-N arrays holding each bird's height and vertical speed
+        outputs: (n, 1) network outputs, one row per entry of active
+        active: Indices of the birds still flying
+        gravity: Falling acceleration
+        flap_speed: Upward speed a flap sets
+    """
+    for j in range(active.shape[0]):
+        i = active[j]
+        if outputs[j, 0] > 0.0:
+            speed[i] = -flap_speed
+        speed[i] += gravity
+        y[i] += speed[i]
+
+
+@njit(cache=True)
+def broadphase(y, active, rects, bird_x, bird_width, bird_height):
+    """
+    Tests every flying bird's rect against every obstacle rect.
+
+    Args:
+        y: Length-N array of bird heights
+        active: Indices of the birds still flying
+        rects: (P, 4) array of obstacle rects as (x, y, width, height)
+        bird_x: Horizontal position shared by every bird
+        bird_width, bird_height: Size of a bird's rect
+
+    Returns:
+        (n, P) boolean array, True where bird active[j] overlaps obstacle k
+    """
+    overlap = np.zeros((active.shape[0], rects.shape[0]), dtype=np.bool_)
+    for k in range(rects.shape[0]):
+        # Every bird is at bird_x, so obstacles away from that column are skipped outright
+        if rects[k, 0] >= bird_x + bird_width or rects[k, 0] + rects[k, 2] <= bird_x:
+            continue
+        top = rects[k, 1]
+        bottom = rects[k, 1] + rects[k, 3]
+        for j in range(active.shape[0]):
+            bird_y = y[active[j]]
+            overlap[j, k] = bird_y < bottom and bird_y + bird_height > top
+    return overlap
@@ -1,14 +1,18 @@
 # Inverted Pendulum Game - A physics simulation game where the player balances a pendulum on a moving cart
 # Import required libraries for game rendering (pygame) and numerical computations (numpy)
+import heapq
 import pygame
 import sys
+import multiprocessing
 import numpy as np
-import random
 from pygame.locals import *
 import neat
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 import utils.visualize as visualize
+from utils.batch_network import BatchFeedForwardNetwork
+from utils.parallel import ChunkedParallelEvaluator
+from physics import NONE, choose_actions, step_all
 # Configuration constants for the game
 WINDOWDIMS = (1200, 600)  # Window width and height in pixels
 CARTDIMS = (50, 10)  # Cart width and height in pixels
@@ -16,282 +20,258 @@ PENDULUMDIMS = (6, 200)  # Pendulum width and length in pixels
 GRAVITY = 0.10  # Gravity acceleration factor for the pendulum
 REFRESHFREQ = 100  # Game refresh frequency (frames per second)
 A_CART = 0.15  # Cart acceleration magnitude when moving left or right
+# Corners of an upright pendulum relative to its pivot, split into x and y components
+STATIC_PEND_X = np.array([-PENDULUMDIMS[0] / 2, PENDULUMDIMS[0] / 2, PENDULUMDIMS[0] / 2, -PENDULUMDIMS[0] / 2])
+STATIC_PEND_Y = np.array([0, 0, -PENDULUMDIMS[1], -PENDULUMDIMS[1]])
 FAST_MODE = False  # Set to False to visualize; True runs headless for faster simulations
-# InvertedPendulum class: Handles the physics simulation of the inverted pendulum system
-class InvertedPendulum(object):
-    def __init__(self, windowdims, cartdims, penddims, gravity, a_cart, color=None):
-        # Store window dimensions
-        self.WINDOWWIDTH = windowdims[0]
-        self.WINDOWHEIGHT = windowdims[1]
-        # Store cart dimensions
-        self.CARTWIDTH = cartdims[0]
-        self.CARTHEIGHT = cartdims[1]
+if FAST_MODE:
+    # Keep SDL from probing for a display driver in headless runs
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+MAX_STEPS = 5000  # Frame cap per generation so a perfect balancer cannot run forever
+# Pendulum colors, assigned by genome key
+PALETTE = [(230, 25, 75), (60, 180, 75), (255, 225, 25), (67, 99, 216),
+           (245, 130, 49), (145, 30, 180), (70, 240, 240), (240, 50, 230),
+           (188, 246, 12), (250, 190, 190), (0, 128, 128), (230, 190, 255),
+           (154, 99, 36), (255, 250, 200), (170, 255, 195), (128, 128, 255)]
+_net_cache = {}  # Networks of the previous generation by genome key, reused for the genomes that survive it
+
+
+class PendulumPop(object):
+    """
+    Structure-of-arrays state for a whole population of cart/pendulum systems.
 
-        # Store pendulum dimensions
-        self.PENDULUMWIDTH = penddims[0]
-        self.PENDULUMLENGTH = penddims[1]
+    Each array holds one lane per genome and lanes keep their index for the
+    whole generation; fallen pendulums are flagged in `dead` and dropped from
+    `active`, the only lanes the networks and the physics step visit, instead
+    of being removed. The genomes, their batched network and their fitness
+    are indexed by the same lanes.
+    """
 
-        # Store physics parameters
+    def __init__(self, genomes, config, windowdims, cartdims, penddims, gravity, a_cart):
+        self.genomes = genomes
+        # Every genome's network, evaluated for the whole population at once
+        self.nets = BatchFeedForwardNetwork.create(genomes, config, _net_cache)
+        self.size = len(genomes)
+        self.WINDOWWIDTH = windowdims[0]
+        # Calculate the y-coordinate of the carts (3/4 down the window)
+        self.Y_CART = 3 * windowdims[1] / 4
+
+        # Physics parameters and invariants of the step
         self.GRAVITY = gravity
         self.A_CART = a_cart
+        self._inv_L = 1.0 / penddims[1]
+        self._x_min = cartdims[0] / 2
+        self._x_max = windowdims[0] - cartdims[0] / 2
 
-        # Calculate the y-coordinate of the cart (3/4 down the window)
-        self.Y_CART = 3 * self.WINDOWHEIGHT / 4
-        # Pick a stable color for this pendulum; if provided, keep it, otherwise generate once
-        if color is None:
-            self.color = (np.random.randint(0, 256), np.random.randint(0, 256), np.random.randint(0, 256))
-        else:
-            self.color = color
-
-        # Initialize the pendulum state
         self.reset_state()
 
     def reset_state(self):
-        """Initializes pendulum in upright state with small perturbation"""
-        self.is_dead = False  # Tracks if the pendulum has fallen (game over)
-        self.time = 0  # Time elapsed in game frames
-        # Cart's initial x position (center of window)
-        self.x_cart = np.random.uniform(0.4, 0.6) * self.WINDOWWIDTH
-        self.v_cart = np.random.uniform(-1, 1)        # Angle of pendulum (theta = 0 upright, omega positive into the screen)
-        # Small random perturbation to make the game more challenging
-        self.theta =np.random.uniform(-np.pi/4, np.pi/4) 
-        # self.theta =np.random.uniform(-0.01, 0.01) 
-
-        self.omega = 0  # Initial angular velocity of pendulum
-
-    def get_state(self):
-        """Returns the current state of the pendulum system as a tuple"""
-        return (self.is_dead, self.time, self.x_cart,
-                self.v_cart, self.theta, self.omega)
-
-    def set_state(self, state):
-        """
-        Sets the pendulum system state from a tuple.
-
-        Args:
-            state (tuple): A tuple containing six elements in the following order:
-                - is_dead (bool): Whether the pendulum system has failed/reached terminal state
-                - t (float): Current time value
-                - x (float): Cart position
-                - v (float): Cart velocity
-                - theta (float): Pendulum angle (in radians)
-                - omega (float): Pendulum angular velocity
-
-        Returns:
-            None
+        """Initializes every pendulum upright with a small random perturbation"""
+        n = self.size
+        self.time = 0  # Time elapsed in game frames, shared by every lane
+        self.dead = np.zeros(n, dtype=bool)
+        self.x = np.random.uniform(0.4, 0.6, n) * self.WINDOWWIDTH
+        self.v = np.random.uniform(-1, 1, n)
+        self.theta = np.random.uniform(-np.pi/4, np.pi/4, n)
+        self.omega = np.zeros(n)
+        self.sin_theta = np.sin(self.theta)  # Refreshed by the physics step, which already computes it
+        self.fitness = np.zeros(n)  # Written back to the genomes by write_fitness()
+        self.active = np.arange(n)  # Indices of the pendulums still standing
+
+    def step(self, actions):
         """
-        """Sets the pendulum system state from a tuple"""
-        is_dead, t, x, v, theta, omega = state
-        self.is_dead = is_dead
-        self.time = t
-        self.x_cart = x
-        self.v_cart = v
-        self.theta = theta
-        self.omega = omega
-
-    def update_state(self, action):
-        """
-        Updates the pendulum system state based on physics and player action.
-        All the physics calculations are performed here.
+        Advances every standing pendulum by one frame.
 
         Args:
-            action: String indicating cart movement ("Left", "Right", or "None")
+            actions: Length-N int8 array of LEFT, NONE or RIGHT codes
 
         Returns:
-            Tuple of (time, x_cart, v_cart, theta, omega)
+            Boolean array flagging the pendulums that fell during this frame
         """
-        assert isinstance(action, str)
-
-        # Check if pendulum is already fallen
-        if self.is_dead:
-            raise RuntimeError(
-                "tried to call update_state while state was dead")
-
-        # Increment time by one frame
         self.time += 1
+        return step_all(self.x, self.v, self.theta, self.omega, self.sin_theta, self.dead, actions, self.active,
+                        self._x_min, self._x_max, self._inv_L, self.GRAVITY, self.A_CART)
 
-        # Update cart position based on velocity
-        self.x_cart += self.v_cart
+    def remove_fallen(self, fell):
+        """Drops the pendulums flagged in fell from the active lanes"""
+        if fell.any():
+            self.active = np.flatnonzero(~self.dead)
 
-        # Boundary conditions: cart stops when it hits the walls
-        if self.x_cart <= self.CARTWIDTH / 2:
-            self.x_cart = self.CARTWIDTH / 2
-            self.v_cart = 0
-        elif self.x_cart >= self.WINDOWWIDTH - self.CARTWIDTH / 2:
-            self.x_cart = self.WINDOWWIDTH - self.CARTWIDTH / 2
-            self.v_cart = 0
+    def write_fitness(self):
+        """Stores each lane's fitness on its genome"""
+        for g, f in zip(self.genomes, self.fitness.tolist()):
+            g.fitness = f
 
-        # Update pendulum angle: term from angular velocity + term from motion of cart
-        self.theta += self.omega + self.v_cart * \
-            np.cos(self.theta) / float(self.PENDULUMLENGTH)
-
-        # Update angular velocity based on gravity and pendulum angle
-        self.omega += self.GRAVITY * \
-            np.sin(self.theta) / float(self.PENDULUMLENGTH)
-
-        # Apply cart acceleration based on player action
-        if action == "Left":
-            self.v_cart -= self.A_CART
-        elif action == "Right":
-            self.v_cart += self.A_CART
-        elif action == "None":
-            self.v_cart *= 0.98
-        else:
-            raise RuntimeError("action must be 'Left', 'Right', or 'None'")
-
-        # Check if pendulum has fallen (angle exceeds 90 degrees)
-        if (abs(self.theta) >= np.pi / 2) or self.x_cart <= self.CARTWIDTH / 2 or self.x_cart >= WINDOWDIMS[0] - self.CARTWIDTH / 2:
-            self.is_dead = True
+    def time_seconds(self):
+        """Converts elapsed game frames to seconds"""
+        return self.time / float(REFRESHFREQ)
 
-        return self.time, self.x_cart, self.v_cart, self.theta, self.omega
 
+class PopulationRenderer(object):
+    """
+    Draws a whole PendulumPop in the game window; only created when not in FAST_MODE.
+    """
 
-    def render_text(self, text, point, position="center", fontsize=48):
+    def __init__(self):
+        # Initialize pygame and create game window
+        pygame.init()
+        self.clock = pygame.time.Clock()
+        self.surface = pygame.display.set_mode(WINDOWDIMS, HWSURFACE | DOUBLEBUF, 32)
+        pygame.display.set_caption('Inverted Pendulum Game')
+        # Only quit and key presses are handled, so keep everything else out of the queue
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed([QUIT, KEYDOWN])
+        self.font = pygame.font.Font(None, 36)
+        # Genome labels never change, so each one is rendered once and reused
+        self.label_cache = {}
+        self.polygon = [[0.0, 0.0], [0.0, 0.0], [0.0, 0.0], [0.0, 0.0]]  # Reused vertex list for drawing
+        self.buffers = None  # Vertex buffers, sized for the population on the first frame
+
+    def _scratch(self, n):
+        """Returns preallocated (x, cos, sin, verts_x, verts_y, tmp) buffers with room for n pendulums"""
+        if self.buffers is None or self.buffers[0].shape[0] < n:
+            self.buffers = (np.empty((n, 1)), np.empty((n, 1)), np.empty((n, 1)),
+                            np.empty((n, 4)), np.empty((n, 4)), np.empty((n, 4)))
+        return [buf[:n] for buf in self.buffers]
+
+    def render(self, pop):
         """
-        Renders text on the game window at the specified position.
+        Handles window events and draws one frame.
 
         Args:
-            text: String to render
-            point: Tuple of (x, y) coordinates
-            position: Positioning mode - "center" or "topleft" (default: "center")
-            fontsize: Font size in pixels (default: 48)
+            pop: PendulumPop holding the state, genomes and fitness of every pendulum
         """
-      
+        surface, font, polygon = self.surface, self.font, self.polygon
+        ge, active, fitness = pop.genomes, pop.active, pop.fitness
+        self.clock.tick(REFRESHFREQ)
+        surface.fill((0,0,0))
 
-    def time_seconds(self):
-        """Converts elapsed game frames to seconds"""
-        return self.time / float(REFRESHFREQ)
-
-
-def rotation_matrix(theta):
-    """
-    Creates a 2D rotation matrix for the given angle.
-
-    Args:
-        theta: Angle in radians
+        if pygame.event.peek((QUIT, KEYDOWN)):
+            for event in pygame.event.get():
+                if event.type == QUIT:
+                    pygame.quit()
+                if event.type == KEYDOWN:
+                    if event.key == K_ESCAPE:
+                        pygame.quit()
+                        sys.exit()
 
-    Returns:
-        2x2 rotation matrix
-    """
-    return np.array([[np.cos(theta), np.sin(theta)],
-                     [-1 * np.sin(theta), np.cos(theta)]])
+        x, cos_t, sin_t, verts_x, verts_y, tmp = self._scratch(active.size)
+        np.take(pop.x, active, out=x[:, 0])
+        np.take(pop.theta, active, out=cos_t[:, 0])
+        np.cos(cos_t, out=cos_t)
+        np.take(pop.sin_theta, active, out=sin_t[:, 0])
+
+        # Rotate every pendulum outline about its pivot at once, one row per pendulum,
+        # writing into the scratch buffers instead of allocating temporaries
+        np.multiply(cos_t, STATIC_PEND_X, out=verts_x)
+        np.multiply(sin_t, STATIC_PEND_Y, out=tmp)
+        verts_x += tmp
+        verts_x += x
+        np.multiply(cos_t, STATIC_PEND_Y, out=verts_y)
+        np.multiply(sin_t, STATIC_PEND_X, out=tmp)
+        verts_y -= tmp
+        verts_y += pop.Y_CART
+
+        # Convert to plain floats once per frame instead of boxing NumPy scalars per corner
+        cart_xs = x[:, 0].tolist()
+        corners_x = verts_x.tolist()
+        corners_y = verts_y.tolist()
+
+        for j, i in enumerate(active.tolist()):
+            color = ge[i].color
+            # A solid cart is an axis-aligned fill, cheaper than pygame.draw.rect
+            surface.fill(color, (cart_xs[j] - CARTDIMS[0] // 2, pop.Y_CART, CARTDIMS[0], CARTDIMS[1]))
+            for corner, cx, cy in zip(polygon, corners_x[j], corners_y[j]):
+                corner[0] = cx
+                corner[1] = cy
+            pygame.draw.polygon(surface, color, polygon)
+
+        time_text = font.render(f"Time: {pop.time_seconds():.1f}s", True, (255, 255, 255))
+        hud = [(time_text, (10, 10))]
+                
+        # Display top 3 genomes with their colors and genome IDs
+        top_3_indices = heapq.nlargest(3, active.tolist(), key=fitness.__getitem__)
+        y_offset = 50
+        for rank, idx in enumerate(top_3_indices, start=1):
+            label = (rank, ge[idx].key)
+            genome_text = self.label_cache.get(label)
+            if genome_text is None:
+                genome_text = self.label_cache[label] = font.render(f"{rank}){ge[idx].key}", True, ge[idx].color)
+            hud.append((genome_text, (10, 10 + y_offset * rank)))
+        surface.blits(hud, doreturn=False)
+
+        pygame.display.update()
 
 
 def run_pendulum(genomes, config):
-    nets = []
     ge = []
-    pendulums = []
     for _, g in genomes:
-        net = neat.nn.FeedForwardNetwork.create(g, config)
         # Ensure each genome keeps the same color during its lifetime
         if not hasattr(g, "color"):
-            rng = random.Random(g.key)
-            g.color = (rng.randint(40, 255), rng.randint(40, 255), rng.randint(40, 255))
-
-        pendulum = InvertedPendulum(
-            WINDOWDIMS, CARTDIMS, PENDULUMDIMS, GRAVITY, A_CART, color=g.color)
-        g.fitness = 0
-        nets.append(net)
-        pendulums.append(pendulum)
+            g.color = PALETTE[g.key % len(PALETTE)]
         ge.append(g)
 
-    # Initialize game state variables
-    high_score = 0  # Track the best score achieved
+    # Headless runs never touch pygame; otherwise open the window for this generation
+    renderer = None if FAST_MODE else PopulationRenderer()
+
+    # One lane per genome; lanes keep their index for the whole generation
+    pop = PendulumPop(ge, config, WINDOWDIMS, CARTDIMS, PENDULUMDIMS, GRAVITY, A_CART)
+    actions = np.full(pop.size, NONE, dtype=np.int8)  # Allocated once, refilled from the network outputs
+    inputs_buf = np.empty((pop.size, 4))
+
+    while pop.active.size and pop.time < MAX_STEPS:
+        active = pop.active
+
+        # Build the network inputs for every standing pendulum at once from the batched state
+        # straight into the preallocated buffer, without temporaries
+        inputs = inputs_buf[:active.size]
+        x_in, v_in, sin_in, omega_in = inputs.T
+        np.take(pop.x, active, out=x_in)
+        np.take(pop.v, active, out=v_in)
+        np.take(pop.sin_theta, active, out=sin_in)
+        np.take(pop.omega, active, out=omega_in)
+        x_in -= WINDOWDIMS[0] * 0.5
+        x_in *= 2.0 / WINDOWDIMS[0]
+        v_in *= 0.2
+        omega_in *= 0.2
+
+        # Query every standing pendulum's network in one batched pass
+        outputs = pop.nets.activate(inputs, active)
+        choose_actions(outputs, active, actions)
+
+        # Advance every standing pendulum with one compiled physics step
+        fell = pop.step(actions)
 
-    score = 0
-    # Initialize pygame and create game window
-    surface = None
-    clock = None
-    if not FAST_MODE:
-        pygame.init()
-        clock = pygame.time.Clock()
-        surface = pygame.display.set_mode(WINDOWDIMS, 0, 32)
-        pygame.display.set_caption('Inverted Pendulum Game')
+        # fitness is based on how long we are alive and based on the angle of the pendulum
+        x = pop.x[active]
+        theta = pop.theta[active]
+        dist_from_center = np.abs(x - WINDOWDIMS[0]/2) / (WINDOWDIMS[0]/2)
+        angle_fitness = 1.0 - (np.abs(theta) / (np.pi / 2))
 
-    while pendulums and ge:
-        if not FAST_MODE and clock:
-            clock.tick(REFRESHFREQ)
+        # Substantially penalize distance so staying at the edge is never profitable
+        # and give fitness based on how upright the pendulum is (small angle = good)
+        pop.fitness[active] += 0.1 - dist_from_center * 0.001 + angle_fitness * 0.1 - 0.5 * (theta > np.pi / 4)
 
-        if not FAST_MODE and surface:
-            surface.fill((0,0,0))
+        if renderer is not None:
+            renderer.render(pop)
 
-        if not FAST_MODE:
-            for event in pygame.event.get():
-                if event.type == QUIT:
-                    pygame.quit()
-                if event.type == KEYDOWN:
-                    if event.key == K_ESCAPE:
-                        pygame.quit()
-                        sys.exit()
+        # Penalize the pendulums that fell; their lanes are masked out from now on
+        pop.fitness[fell] -= 5
+        pop.remove_fallen(fell)
 
-        # fitness is based on how long we are alive and based on the angle of the pendulum
-        
-
-        for i, pendulum in enumerate(pendulums):
-            is_dead, time, x, v, theta, omega = pendulum.get_state()
-            inputs =[
-            (x - WINDOWDIMS[0]/2) / (WINDOWDIMS[0]/2),
-            v / 5.0,
-            np.sin(theta),
-            omega / 5.0
-            ]
-
-            output = nets[i].activate(inputs)
-            action = ["Left", "None", "Right"][np.argmax(output)]
-            pendulum.update_state(action)
-            dist_from_center = abs(pendulum.x_cart - WINDOWDIMS[0]/2) / (WINDOWDIMS[0]/2)
-
-            # Substantially penalize distance so staying at the edge is never profitable
-            ge[i].fitness += 0.1
-            ge[i].fitness -= abs(dist_from_center) * 0.001
-            # Give fitness based on how upright the pendulum is (small angle = good)
-            angle_fitness = 1.0 - (abs(pendulum.theta) / (np.pi / 2))
-            ge[i].fitness += angle_fitness * 0.1
-
-            if pendulum.theta > np.pi / 4:
-                ge[i].fitness -= 0.5
-            if not FAST_MODE and surface:
-                static_pendulum_array = np.array(
-                    [[PENDULUMDIMS[0] / 2, 0],
-                     [PENDULUMDIMS[0] / 2, 0],
-                     [PENDULUMDIMS[0] / 2, -PENDULUMDIMS[1]],
-                     [-PENDULUMDIMS[0] / 2, -PENDULUMDIMS[1]]]).T
-                cart = pygame.Rect(pendulum.x_cart - CARTDIMS[0] // 2, pendulum.Y_CART, CARTDIMS[0], CARTDIMS[1])
-                pygame.draw.rect(surface, pendulum.color, cart)
-                pendulum_array = np.dot(rotation_matrix(pendulum.theta), static_pendulum_array)
-                pendulum_array += np.array([[pendulum.x_cart], [pendulum.Y_CART]])
-                pygame.draw.polygon(surface, pendulum.color,
-                                    ((pendulum_array[0, 0], pendulum_array[1, 0]),
-                                     (pendulum_array[0, 1], pendulum_array[1, 1]),
-                                     (pendulum_array[0, 2], pendulum_array[1, 2]),
-                                     (pendulum_array[0, 3], pendulum_array[1, 3])))
-        if not FAST_MODE and surface:
-            font = pygame.font.Font(None, 36)
-            time_text = font.render(f"Time: {pendulum.time_seconds():.1f}s", True, (255, 255, 255))
-            surface.blit(time_text, (10, 10))
-                    
-            # Display top 3 genomes with their colors and genome IDs
-            top_3_indices = sorted(range(len(ge)), key=lambda i: ge[i].fitness, reverse=True)[:3]
-            y_offset = 50
-            for rank, idx in enumerate(top_3_indices, start=1):
-                genome_text = font.render(f"{rank}){ge[idx].key}", True, ge[idx].color)
-                surface.blit(genome_text, (10, 10 + y_offset * rank))
-            top_3_indices = sorted(range(len(ge)), key=lambda i: ge[i].fitness, reverse=True)[:3]
-            y_offset = 50
-            
-        if not FAST_MODE and surface:
-            pygame.display.update()
-
-        for i in reversed(range(len(pendulums))):
-            if pendulums[i].is_dead:
-                ge[i].fitness -= 5
-                ge.pop(i)
-                nets.pop(i)
-                pendulums.pop(i)
-
-                    
+    pop.write_fitness()
 
 
+def eval_chunk(chunk, config, seed):
+    """
+    Evaluates a slice of the population in a worker process (see ChunkedParallelEvaluator).
+    Only usable in FAST_MODE, since the workers cannot share a window.
+    """
+    # Every chunk gets its own seed, so its own starting perturbations
+    np.random.seed(seed)
+    run_pendulum(chunk, config)
+    return [g.fitness for _, g in chunk]
+
 
 if __name__ == "__main__":
     # Set configuration file
@@ -308,8 +288,15 @@ if __name__ == "__main__":
     stats = neat.StatisticsReporter()
     p.add_reporter(stats)
 
-    # Run NEAT
-    winner = p.run(run_pendulum,  100)
+    # Run NEAT; headless runs spread each generation across the CPU cores
+    if FAST_MODE:
+        evaluator = ChunkedParallelEvaluator(multiprocessing.cpu_count(), eval_chunk)
+        try:
+            winner = p.run(evaluator.evaluate, 100)
+        finally:
+            evaluator.close()
+    else:
+        winner = p.run(run_pendulum,  100)
     print("Best fitness:", winner.fitness)
 
     # Build readable labels for the network visualization
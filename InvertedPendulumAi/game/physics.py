@@ -0,0 +1,112 @@
+# Inverted Pendulum physics - simulation kernels for single pendulums and whole populations
+import math
+import numpy as np
+from numba import njit, prange
+
+# Cart actions (integer codes so the kernels can run in nopython mode; step() relies on this order)
+LEFT, NONE, RIGHT = 0, 1, 2
+
+
+# Explicit signature: compiled eagerly at import (or loaded from the cache) instead of on first call
+@njit('Tuple((f8, f8, f8, f8, f8, b1))(f8, f8, f8, f8, f8, f8, f8, f8, f8, i8)', cache=True, fastmath=True)
+def step(x, v, theta, omega, x_min, x_max, inv_length, gravity, a_cart, action):
+    """
+    Advances a single cart/pendulum system by one frame.
+
+    Args:
+        x, v: Cart position and velocity
+        theta, omega: Pendulum angle (in radians) and angular velocity
+        x_min, x_max: Cart positions at which it touches the left and right walls
+        inv_length: Reciprocal of the pendulum length in pixels
+        gravity: Gravity acceleration factor for the pendulum
+        a_cart: Cart acceleration magnitude
+        action: One of LEFT, NONE or RIGHT
+
+    Returns:
+        Tuple of (x, v, theta, omega, sin_theta, dead), where sin_theta is the sine of the new angle
+    """
+    # Update cart position based on velocity
+    x += v
+
+    # Boundary conditions: cart stops when it hits the walls
+    if x <= x_min:
+        x = x_min
+        v = 0.0
+    elif x >= x_max:
+        x = x_max
+        v = 0.0
+
+    # Update pendulum angle: term from angular velocity + term from motion of cart
+    theta += omega + v * math.cos(theta) * inv_length
+
+    # Update angular velocity based on gravity and pendulum angle
+    sin_theta = math.sin(theta)
+    omega += gravity * sin_theta * inv_length
+
+    # Apply cart acceleration based on the action: the codes are ordered so that
+    # action - NONE is the direction (-1, 0 or +1), which avoids a branch per lane
+    v += (action - NONE) * a_cart
+    if action == NONE:
+        v *= 0.98
+
+    # Check if pendulum has fallen (angle exceeds 90 degrees) or the cart hit a wall
+    dead = abs(theta) >= math.pi / 2 or x <= x_min or x >= x_max
+
+    return x, v, theta, omega, sin_theta, dead
+
+
+@njit(cache=True)
+def choose_actions(outputs, rows, actions):
+    """
+    Picks the action with the highest network output for each row.
+
+    With only three outputs two comparisons per row beat a generic argmax
+    followed by a scattered assignment. Ties go to the earlier action.
+
+    Args:
+        outputs: (n, 3) network outputs for the LEFT, NONE and RIGHT actions
+        rows: Length-n indices of the lanes the outputs belong to
+        actions: Length-N int8 action array, updated in place
+    """
+    for j in range(rows.shape[0]):
+        a, b, c = outputs[j, 0], outputs[j, 1], outputs[j, 2]
+        if a >= b and a >= c:
+            actions[rows[j]] = LEFT
+        elif b >= c:
+            actions[rows[j]] = NONE
+        else:
+            actions[rows[j]] = RIGHT
+
+
+@njit(parallel=True, cache=True, fastmath=True)
+def step_all(x, v, theta, omega, sin_theta, dead, actions, active, x_min, x_max, inv_length, gravity, a_cart):
+    """
+    Advances a whole population of cart/pendulum systems by one frame.
+
+    The state arrays are updated in place; the independent systems are
+    split across threads, each one running the same update as step().
+    Only the lanes listed in active are visited, so fallen systems cost
+    nothing once they have been dropped from it.
+
+    Args:
+        x, v, theta, omega: Length-N arrays holding the state of each system
+        sin_theta: Length-N array receiving the sine of each new angle
+        dead: Length-N boolean array of fallen systems, updated in place
+        actions: Length-N int8 array of LEFT, NONE or RIGHT codes
+        active: Indices of the systems still standing
+        x_min, x_max: Cart positions at which it touches the left and right walls
+        inv_length: Reciprocal of the pendulum length in pixels
+        gravity: Gravity acceleration factor for the pendulum
+        a_cart: Cart acceleration magnitude
+
+    Returns:
+        Boolean array flagging the systems that fell during this frame
+    """
+    n = x.shape[0]
+    fell = np.zeros(n, dtype=np.bool_)
+    for j in prange(active.shape[0]):
+        i = active[j]
+        x[i], v[i], theta[i], omega[i], sin_theta[i], fell[i] = step(
+            x[i], v[i], theta[i], omega[i], x_min, x_max, inv_length, gravity, a_cart, actions[i])
+        dead[i] = fell[i]
+    return fell
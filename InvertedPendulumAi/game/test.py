@@ -8,6 +8,16 @@ PENDULUMDIMS = (6, 200)
 GRAVITY = 0.13
 REFRESHFREQ = 100
 A_CART = 0.15
+# cart actions
+LEFT, NONE, RIGHT = 0, 1, 2
+# fonts by size, shared by every render_text call
+_FONT_CACHE = {}
+
+def get_font(fontsize):
+    font = _FONT_CACHE.get(fontsize)
+    if font is None:
+        font = _FONT_CACHE[fontsize] = pygame.font.SysFont(None, fontsize)
+    return font
 
 class InvertedPendulum(object):
     def __init__(self, windowdims, cartdims, penddims, gravity, a_cart):
@@ -49,7 +59,6 @@ class InvertedPendulum(object):
 
     def update_state(self, action):
         """all the physics is here"""
-        assert isinstance(action, str)
         if self.is_dead:
             raise RuntimeError("tried to call update_state while state was dead")
         self.time += 1
@@ -64,14 +73,14 @@ class InvertedPendulum(object):
         # term from angular velocity + term from motion of cart
         self.theta += self.omega + self.v_cart * np.cos(self.theta) / float(self.PENDULUMLENGTH)
         self.omega += self.GRAVITY * np.sin(self.theta) / float(self.PENDULUMLENGTH)
-        if action == "Left":
+        if action == LEFT:
             self.v_cart -= self.A_CART
-        elif action == "Right":
+        elif action == RIGHT:
             self.v_cart += self.A_CART
-        elif action == "None":
+        elif action == NONE:
             self.v_cart = 0
         else:
-            raise RuntimeError("action must be 'Left', 'Right', or 'None'")
+            raise RuntimeError("action must be LEFT, RIGHT, or NONE")
         if abs(self.theta) >= np.pi / 2:
             self.is_dead = True
         return self.time, self.x_cart, self.v_cart, self.theta, self.omega
@@ -111,6 +120,8 @@ class InvertedPendulumGame(object):
              [-self.PENDULUMWIDTH / 2, -self.PENDULUMLENGTH]]).T
         self.BLACK = (0,0,0)
         self.WHITE = (255,255,255)
+        # rendered "t = ..." surfaces keyed by tenths of a second
+        self.time_text_cache = {}
 
     def draw_cart(self, x, theta):
         cart = pygame.Rect(x - self.CARTWIDTH // 2, self.Y_CART, self.CARTWIDTH, self.CARTHEIGHT)
@@ -129,7 +140,7 @@ class InvertedPendulumGame(object):
                          [-1 * np.sin(theta), np.cos(theta)]])
 
     def render_text(self, text, point, position = "center", fontsize = 48):
-        font = pygame.font.SysFont(None, fontsize)
+        font = get_font(fontsize)
         text_render = font.render(text, True, self.BLACK, self.WHITE)
         text_rect = text_render.get_rect()
         if position == "center":
@@ -138,6 +149,19 @@ class InvertedPendulumGame(object):
             text_rect.topleft = point
         self.surface.blit(text_render, text_rect)
 
+    def render_time(self, point, fontsize = 40):
+        # the clock shows tenths of a second, so a rendered surface is reused
+        # for every frame until the displayed value changes
+        key = self.time * 10 // self.REFRESHFREQ
+        text_render = self.time_text_cache.get(key)
+        if text_render is None:
+            if len(self.time_text_cache) >= 256:
+                self.time_text_cache.clear()
+            text_render = get_font(fontsize).render("t = {:.1f}".format(key / 10),
+                                                    True, self.BLACK, self.WHITE)
+            self.time_text_cache[key] = text_render
+        self.surface.blit(text_render, point)
+
     def time_seconds(self):
         return self.time / float(self.REFRESHFREQ)
 
@@ -155,7 +179,7 @@ class InvertedPendulumGame(object):
 
     def game_round(self):
         self.pendulum.reset_state()
-        action = "None"
+        action = NONE
         while not self.pendulum.is_dead:
             for event in pygame.event.get():
                 if event.type == QUIT:
@@ -163,14 +187,14 @@ class InvertedPendulumGame(object):
                     sys.exit()
                 if event.type == KEYDOWN:
                     if event.key == K_LEFT:
-                        action = "Left"
+                        action = LEFT
                     if event.key == K_RIGHT:
-                        action = "Right"
+                        action = RIGHT
                 if event.type == KEYUP:
                     if event.key == K_LEFT:
-                        action = "None"
+                        action = NONE
                     if event.key == K_RIGHT:
-                        action = "None"
+                        action = NONE
                     if event.key == K_ESCAPE:
                         pygame.quit()
                         sys.exit()
@@ -179,9 +203,7 @@ class InvertedPendulumGame(object):
             self.surface.fill(self.WHITE)
             self.draw_cart(x, theta)
 
-            time_text = "t = {}".format(self.time_seconds())
-            self.render_text(time_text, (0.1 * self.WINDOWWIDTH, 0.1 * self.WINDOWHEIGHT),
-                             position = "topleft", fontsize = 40)
+            self.render_time((0.1 * self.WINDOWWIDTH, 0.1 * self.WINDOWHEIGHT))
             
             pygame.display.update()
             self.clock.tick(self.REFRESHFREQ)
@@ -203,17 +225,23 @@ class InvertedPendulumGame(object):
     def game(self):
         self.starting_page()
         while True:
+            start = False
             for event in pygame.event.get():
                 if event.type == QUIT:
                     pygame.quit()
                     sys.exit()
                 if event.type == KEYDOWN:
                     if event.key == K_RETURN:
-                        self.game_round()
-                        self.end_of_round()
+                        start = True
                     if event.key == K_ESCAPE:
                         pygame.quit()
                         sys.exit()
+            # play at most one round per pass, after the queued events are handled
+            if start:
+                self.game_round()
+                self.end_of_round()
+                # drop input captured during the round that just ended
+                pygame.event.clear()
   
 def main():
     inv = InvertedPendulumGame(WINDOWDIMS, CARTDIMS, PENDULUMDIMS, GRAVITY, A_CART, REFRESHFREQ)
@@ -0,0 +1,178 @@
+import math
+
+import numpy as np
+from neat.activations import (abs_activation, clamped_activation, gauss_activation, identity_activation,
+                              relu_activation, sigmoid_activation, sin_activation, tanh_activation)
+from neat.aggregations import sum_aggregation
+from neat.nn import FeedForwardNetwork
+from numba import njit, prange
+
+
+# Codes of the neat-python activation functions the compiled evaluator implements.
+ACTIVATIONS = {
+    sigmoid_activation: 0,
+    tanh_activation: 1,
+    sin_activation: 2,
+    gauss_activation: 3,
+    relu_activation: 4,
+    identity_activation: 5,
+    clamped_activation: 6,
+    abs_activation: 7,
+}
+
+
+# Activations that are positive exactly when their input is: tanh, relu, identity and clamped.
+SIGN_PRESERVING = frozenset(ACTIVATIONS[f] for f in (tanh_activation, relu_activation,
+                                                    identity_activation, clamped_activation))
+
+
+@njit(cache=True)
+def _activation(code, z):
+    """ Scalar equivalent of neat-python's activation function with the given code. """
+    if code == 0:
+        return 1.0 / (1.0 + math.exp(-max(-60.0, min(60.0, 5.0 * z))))
+    elif code == 1:
+        return math.tanh(max(-60.0, min(60.0, 2.5 * z)))
+    elif code == 2:
+        return math.sin(max(-60.0, min(60.0, 5.0 * z)))
+    elif code == 3:
+        z = max(-3.4, min(3.4, z))
+        return math.exp(-5.0 * z ** 2)
+    elif code == 4:
+        return z if z > 0.0 else 0.0
+    elif code == 5:
+        return z
+    elif code == 6:
+        return max(-1.0, min(1.0, z))
+    return abs(z)
+
+
+@njit(parallel=True, cache=True)
+def _evaluate(inputs, rows, weights, biases, responses, activations, output_slots, outputs, scratch):
+    """ Runs network rows[j] on inputs[j] for every j, writing its outputs to outputs[j].
+
+    scratch is an (n, S) buffer holding the slot values of each row while it is evaluated.
+    """
+    num_nodes = weights.shape[0]
+    num_inputs = inputs.shape[1]
+    for j in prange(rows.shape[0]):
+        i = rows[j]
+        values = scratch[j]
+        values[:num_inputs] = inputs[j]
+        values[num_inputs:] = 0.0
+        for k in range(num_nodes):
+            # Node k can only read the inputs and the nodes evaluated before it.
+            end = num_inputs + k
+            s = 0.0
+            for src in range(end):
+                s += weights[k, i, src] * values[src]
+            values[end] = _activation(activations[k, i], biases[k, i] + responses[k, i] * s)
+        for o in range(output_slots.shape[1]):
+            outputs[j, o] = values[output_slots[i, o]]
+
+
+class BatchFeedForwardNetwork(object):
+    """
+    Evaluates the feed-forward networks of a whole population in one batched pass.
+
+    Every network's nodes are laid out in evaluation order in a shared slot
+    space: the inputs come first, then one slot per evaluated node, then a
+    slot that always holds zero for outputs the network never computes.
+    Networks with fewer nodes are padded with zero weights, so every network
+    runs the same straight-line loop in a compiled kernel instead of walking
+    neat-python's list of node evaluations.
+    The parameters are stored node-major, so the weights of node k for the
+    whole population are one contiguous (N, S) block.
+    """
+
+    def __init__(self, num_inputs, output_slots, weights, biases, responses, activations):
+        self.num_inputs = num_inputs
+        self.output_slots = output_slots  # (N, num_outputs) slot index of each output
+        self.weights = weights  # (K, N, S) incoming weights of node k from every slot
+        self.biases = biases  # (K, N)
+        self.responses = responses  # (K, N)
+        self.activations = activations  # (K, N) activation code of node k
+        self.all_rows = np.arange(len(self))
+
+    def __len__(self):
+        return self.weights.shape[1]
+
+    def activate(self, inputs, rows=None):
+        """ Receives an (n, num_inputs) array and returns the (n, num_outputs) network outputs.
+
+        If rows is given, only the networks at those indices are evaluated, one per input row.
+        """
+        if rows is None:
+            rows = self.all_rows
+        outputs = np.empty((len(rows), self.output_slots.shape[1]))
+        scratch = np.empty((len(rows), self.weights.shape[2]))
+        _evaluate(inputs, rows, self.weights, self.biases, self.responses, self.activations,
+                  self.output_slots, outputs, scratch)
+        return outputs
+
+    def scale_inputs(self, scales):
+        """ Folds a constant scale per input into the input weights, so unnormalized inputs can be activated. """
+        self.weights[:, :, :self.num_inputs] *= scales
+
+    def linearize_outputs(self):
+        """ Skips the activation of the output nodes, so activate() returns their pre-activation values.
+
+        For callers that only test whether an output is positive: the supported activations are
+        positive exactly when their pre-activation value is, so the test gives the same answer
+        without the transcendental. Output nodes that other nodes read keep their activation.
+        """
+        num_nodes = self.weights.shape[0]
+        for i, o in zip(*np.nonzero((self.output_slots >= self.num_inputs)
+                                    & (self.output_slots < self.num_inputs + num_nodes))):
+            slot = self.output_slots[i, o]
+            k = slot - self.num_inputs
+            if self.weights[k + 1:, i, slot].any():
+                continue
+            if self.activations[k, i] not in SIGN_PRESERVING:
+                raise ValueError("Only outputs whose activation keeps the sign of its input can be linearized")
+            self.activations[k, i] = ACTIVATIONS[identity_activation]
+
+    @staticmethod
+    def create(genomes, config, cache=None):
+        """ Receives a list of genomes and returns their phenotypes as one batched network.
+
+        If a cache dict is given, it maps genome keys to their FeedForwardNetwork: genomes that
+        survive unchanged from the previous call (the elites) reuse theirs, and the keys of
+        genomes that are gone are evicted.
+        """
+        if cache is None:
+            nets = [FeedForwardNetwork.create(g, config) for g in genomes]
+        else:
+            nets = [cache.get(g.key) or FeedForwardNetwork.create(g, config) for g in genomes]
+            cache.clear()
+            cache.update((g.key, net) for g, net in zip(genomes, nets))
+        num_inputs = len(config.genome_config.input_keys)
+        num_nodes = max((len(net.node_evals) for net in nets), default=0)
+        num_slots = num_inputs + num_nodes + 1
+        zero_slot = num_slots - 1
+
+        n = len(nets)
+        weights = np.zeros((num_nodes, n, num_slots))
+        biases = np.zeros((num_nodes, n))
+        responses = np.zeros((num_nodes, n))
+        # Padded nodes evaluate to identity(0) = 0 and are never read anyway
+        activations = np.full((num_nodes, n), ACTIVATIONS[identity_activation], dtype=np.int8)
+        output_slots = np.full((n, len(config.genome_config.output_keys)), zero_slot, dtype=np.intp)
+
+        for i, net in enumerate(nets):
+            slots = {key: j for j, key in enumerate(net.input_nodes)}
+            for k, (node, act_func, agg_func, bias, response, links) in enumerate(net.node_evals):
+                if agg_func is not sum_aggregation:
+                    raise ValueError("Batched evaluation only supports the sum aggregation")
+                if act_func not in ACTIVATIONS:
+                    raise ValueError(f"Batched evaluation does not support activation {act_func.__name__}")
+                for src, w in links:
+                    weights[k, i, slots.get(src, zero_slot)] += w
+                biases[k, i] = bias
+                responses[k, i] = response
+                activations[k, i] = ACTIVATIONS[act_func]
+                slots[node] = num_inputs + k
+            for j, key in enumerate(net.output_nodes):
+                output_slots[i, j] = slots.get(key, zero_slot)
+
+        return BatchFeedForwardNetwork(num_inputs, output_slots, weights, biases, responses, activations)
@@ -0,0 +1,48 @@
+import multiprocessing
+
+import numba
+import numpy as np
+
+
+class ChunkedParallelEvaluator(object):
+    """
+    Splits each generation into one chunk per worker process and evaluates every
+    chunk with a batched, population-wide fitness function.
+
+    Unlike neat.ParallelEvaluator, which evaluates one genome per task, each
+    worker keeps the games' batched physics and network passes. The chunk
+    function is called as eval_chunk(chunk, config, seed) with a list of
+    (genome_id, genome) pairs and returns their fitness values in order.
+    """
+
+    def __init__(self, num_workers, eval_chunk, shared_seed=False):
+        self.num_workers = num_workers
+        self.eval_chunk = eval_chunk
+        # With a shared seed every chunk of a generation sees the same random course
+        self.shared_seed = shared_seed
+        # Each worker already has a core to itself, so its Numba kernels run single-threaded
+        # instead of every worker spawning a thread per core
+        self.pool = multiprocessing.Pool(num_workers, initializer=numba.set_num_threads, initargs=(1,))
+
+    def close(self):
+        """ Shuts down the worker processes. """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def evaluate(self, genomes, config):
+        chunks = [genomes[i::self.num_workers] for i in range(self.num_workers)]
+        chunks = [chunk for chunk in chunks if chunk]
+        if self.shared_seed:
+            seeds = np.full(len(chunks), np.random.randint(0, 2**31))
+        else:
+            seeds = np.random.randint(0, 2**31, len(chunks))
+        jobs = [(chunk, config, seed) for chunk, seed in zip(chunks, seeds.tolist())]
+        results = self.pool.starmap(self.eval_chunk, jobs)
+
+        # The workers evaluated copies, so assign the fitness back to each genome
+        for chunk, fitnesses in zip(chunks, results):
+            for (_, genome), fitness in zip(chunk, fitnesses):
+                genome.fitness = fitness
+